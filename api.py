@@ -2,20 +2,18 @@ import os
 import requests
 import json
 import time
+import asyncio
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from datetime import datetime
-from database import save_transaction, get_db_connection
+from database import save_transactions, get_db_connection, load_cursor, save_cursor
 from config import HELIUS_API_KEY
+from rpc_client import get_client, REQUEST_TIMEOUT
+import metrics
+from pipeline import IngestionPipeline
+from lifecycle import IngestionCancelled
 
 print(f"Используется api.py из: {os.path.abspath(__file__)}")
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Accept": "application/json",
-    "Accept-Language": "en-US,en;q=0.9",
-    "Content-Type": "application/json",
-}
-
 # Список RPC URL-ов: основной и резервные
 RPC_URLS = [
     "https://eclipse.helius-rpc.com/?api-key=8b65d9ce-4f9b-4b90-9e4c-af088de240b2",  # Основной (пинг: 0.39 мс)
@@ -25,11 +23,15 @@ RPC_URLS = [
     "https://api-mainnet.helius-rpc.com/?api-key=8b65d9ce-4f9b-4b90-9e4c-af088de240b2",  # Резерв 4 (пинг: 0.51 мс)
 ]
 
-REQUEST_TIMEOUT = 10  # Таймаут 10 секунд
+REQUEST_DELAY = 10  # Задержка между страницами запросов, в секундах
+SIGNATURE_PAGE_LIMIT = 10  # Подписей на страницу getSignaturesForAddress
+MAX_HISTORY_PAGES = 100  # Ограничение страниц исторической загрузки
 
 class RPCUnreachableException(Exception):
     """Исключение для случаев, когда RPC недоступен."""
-    pass
+    def __init__(self, message, app=None):
+        super().__init__(message)
+        self.app = app  # Нужен обработчику retry для ожидания восстановления RPC
 
 def parse_timestamp(timestamp_str):
     """Парсит временную метку из строки."""
@@ -43,13 +45,15 @@ def try_request(payload, app, initial_url_index=0):
     current_url_index = initial_url_index
     while current_url_index < len(RPC_URLS):
         rpc_url = RPC_URLS[current_url_index]
+        app.controller.checkpoint()  # Остановка и пауза срабатывают перед каждым запросом
         try:
             app.log(f"Запрос к RPC: {rpc_url}")
-            response = requests.post(rpc_url, json=payload, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+            response = get_client().post(rpc_url, payload)
             app.log(f"Код ответа HTTP: {response.status_code}")
             response.raise_for_status()
             result = response.json()
-            app.log(f"Ответ RPC: {json.dumps(result, indent=2)}")
+            # Полный jsonParsed ответ не сериализуем в лог: это удваивало память и время на каждую транзакцию
+            app.log(f"Ответ RPC: {len(response.content)} байт")
             if "result" in result or "error" not in result:
                 return result, current_url_index
             else:
@@ -62,7 +66,56 @@ def try_request(payload, app, initial_url_index=0):
             current_url_index += 1
             if current_url_index < len(RPC_URLS):
                 app.log(f"Переключение на резервный RPC: {RPC_URLS[current_url_index]}")
-    raise RPCUnreachableException("Все RPC недоступны")
+    raise RPCUnreachableException("Все RPC недоступны", app)
+
+async def atry_request(payload, app, initial_url_index=0):
+    """Асинхронный вариант try_request с тем же порядком переключения RPC."""
+    client = get_client()
+    current_url_index = initial_url_index
+    while current_url_index < len(RPC_URLS):
+        rpc_url = RPC_URLS[current_url_index]
+        if app.controller.stopped or app.controller.paused:
+            # checkpoint блокирует поток, поэтому ждём снятия паузы вне цикла событий
+            await asyncio.to_thread(app.controller.checkpoint)
+        try:
+            response = await client.apost(rpc_url, payload)
+            app.log(f"Код ответа HTTP: {response.status_code}")
+            response.raise_for_status()
+            result = response.json()
+            if "result" in result or "error" not in result:
+                return result, current_url_index
+            app.log(f"Некорректный ответ от {rpc_url}: {json.dumps(result, indent=2)}")
+        except requests.exceptions.RequestException as e:
+            app.log(f"Ошибка запроса к {rpc_url}: {e}")
+        current_url_index += 1
+        if current_url_index < len(RPC_URLS):
+            app.log(f"Переключение на резервный RPC: {RPC_URLS[current_url_index]}")
+    raise RPCUnreachableException("Все RPC недоступны", app)
+
+async def afetch_transactions(signatures, app, url_index=0, concurrency=5):
+    """Параллельно загружает транзакции по списку подписей, не более concurrency запросов одновременно."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(signature):
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getTransaction",
+            "params": [signature, {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}]
+        }
+        async with semaphore:
+            result, _ = await atry_request(payload, app, url_index)
+        return result.get("result")
+
+    tasks = [asyncio.ensure_future(fetch_one(sig)) for sig in signatures]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        # gather не отменяет остальные задачи при ошибке одной: без отмены они продолжали бы слать запросы
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
 def ping_rpc(app):
     """Пингует RPC, чтобы проверить его доступность."""
@@ -78,6 +131,8 @@ def ping_rpc(app):
             app.log("RPC доступен.")
             return True
         return False
+    except IngestionCancelled:
+        raise
     except Exception as e:
         app.log(f"Ошибка пинга RPC: {e}")
         return False
@@ -90,8 +145,24 @@ def wait_for_rpc(app):
             app.log("RPC восстановлен. Продолжаем работу.")
             return
         app.log("RPC всё ещё недоступен. Ожидание 5 секунд перед следующим пингом...")
-        time.sleep(5)
+        app.controller.sleep(5)
+
+_rpc_backoff = wait_exponential(multiplier=2, min=4, max=20)
+
+def wait_rpc_backoff(retry_state):
+    """Экспоненциальная пауза между повторами @retry, прерываемая остановкой анализа.
+
+    tenacity спит через time.sleep, который controller.stop() не прерывает, поэтому пауза
+    выдерживается здесь через app.controller.sleep, а tenacity получает нулевую задержку.
+    """
+    seconds = _rpc_backoff(retry_state)
+    app = getattr(retry_state.outcome.exception(), "app", None)
+    if app is None:
+        return seconds
+    app.controller.sleep(seconds)
+    return 0
 
+@metrics.timed("extract_swap_data")
 def extract_swap_data(tx, mint_address, decimals, app):
     """Извлекает данные о свопах из транзакции."""
     if "meta" not in tx or "innerInstructions" not in tx["meta"]:
@@ -126,7 +197,7 @@ def extract_swap_data(tx, mint_address, decimals, app):
 
 @retry(
     stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=2, min=4, max=20),
+    wait=wait_rpc_backoff,
     retry=retry_if_exception_type(RPCUnreachableException),
     after=lambda retry_state: wait_for_rpc(retry_state.outcome._exception.app) if retry_state.outcome.failed else None
 )
@@ -151,17 +222,19 @@ def fetch_token_metadata_from_helius(mint_address, app, url_index=0):
         return None, None, "UNKNOWN", new_url_index
     except requests.exceptions.Timeout:
         app.log(f"Таймаут при запросе метаданных для {mint_address} (ждали {REQUEST_TIMEOUT} секунд)")
-        raise RPCUnreachableException("RPC не отвечает") from None
+        raise RPCUnreachableException("RPC не отвечает", app) from None
     except requests.exceptions.HTTPError as e:
         app.log(f"HTTP ошибка при запросе метаданных для {mint_address}: {e}")
         return None, None, "UNKNOWN", url_index
+    except IngestionCancelled:
+        raise
     except Exception as e:
         app.log(f"Неизвестная ошибка при запросе метаданных для {mint_address}: {e}")
         return None, None, "UNKNOWN", url_index
 
 @retry(
     stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=2, min=4, max=20),
+    wait=wait_rpc_backoff,
     retry=retry_if_exception_type(RPCUnreachableException),
     after=lambda retry_state: wait_for_rpc(retry_state.outcome._exception.app) if retry_state.outcome.failed else None
 )
@@ -169,225 +242,233 @@ def fetch_token_metadata(mint_address, app):
     total_supply, decimals, symbol, _ = fetch_token_metadata_from_helius(mint_address, app)
     return total_supply, decimals, symbol
 
+@metrics.timed("parse_transaction")
+def parse_transaction(tx, mint_address, decimals, symbol, token_id, app):
+    """Разбирает транзакцию в строки для save_transactions: своп и трансферы токена."""
+    signature = tx["transaction"]["signatures"][0]
+    block = tx["slot"]
+    timestamp = str(datetime.fromtimestamp(tx["blockTime"] if tx["blockTime"] else int(time.time())))
+    rows = []
+
+    # Проверяем, является ли транзакция свопом
+    swap_data = extract_swap_data(tx, mint_address, decimals, app)
+    if swap_data:
+        rows.append((token_id, signature, block, timestamp, "SWAP", "unknown", "unknown",
+                     swap_data["token_amount"], symbol, swap_data["price_per_token"], 0))
+
+    # Обрабатываем трансферы
+    if "meta" in tx and "postTokenBalances" in tx["meta"]:
+        for balance in tx["meta"]["postTokenBalances"]:
+            if balance["mint"] == mint_address:
+                amount_raw = float(balance["uiTokenAmount"]["amount"])
+                amount = amount_raw / (10 ** decimals) if decimals else amount_raw
+                from_address = balance.get("owner", "unknown")
+                rows.append((token_id, signature, block, timestamp, "TRANSFER", from_address, "unknown",
+                             amount, symbol, None, 0))
+    return rows
+
+def fetch_transaction(signature, app, url_index=0):
+    """Загружает транзакцию в формате jsonParsed. Возвращает (tx или None, url_index)."""
+    tx_payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "getTransaction",
+        "params": [
+            signature,
+            {
+                "encoding": "jsonParsed",
+                "maxSupportedTransactionVersion": 0  # Добавляем поддержку версии транзакций
+            }
+        ]
+    }
+    tx_result, url_index = try_request(tx_payload, app, url_index)
+    return tx_result.get("result"), url_index
+
+def signature_pages(mint_address, app, cursor, until=None, max_pages=None, last_timestamp=None, on_newest=None):
+    """Генератор страниц подписей getSignaturesForAddress от новых к старым.
+
+    cursor — словарь состояния пейджера: url_index, before (последняя выданная подпись),
+    newest (самая новая подпись загрузки) и complete (история пройдена до конца).
+    on_newest(signature) вызывается один раз, когда становится известна самая новая подпись.
+    """
+    page = 0
+    while max_pages is None or page < max_pages:
+        if page:
+            app.log(f"Задержка {REQUEST_DELAY} секунд перед следующим запросом")
+            with metrics.timed("sleep", loop="pager"):
+                app.controller.sleep(REQUEST_DELAY)
+        page += 1
+        app.log(f"Страница {page}{f'/{max_pages}' if max_pages else ''} подписей для {mint_address}...")
+        options = {"limit": SIGNATURE_PAGE_LIMIT}
+        if cursor["before"]:
+            options["before"] = cursor["before"]
+        if until:
+            options["until"] = until
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getSignaturesForAddress",
+            "params": [mint_address, options]
+        }
+        app.log(f"JSON-RPC запрос для транзакций: {json.dumps(payload)}")
+        result, cursor["url_index"] = try_request(payload, app, cursor["url_index"])
+        if "result" not in result:
+            app.log(f"Отсутствует ключ 'result' в ответе для {mint_address}. Завершаем загрузку.")
+            return
+        signatures = result["result"]
+        if not signatures:
+            app.log(f"Подписи для {mint_address} загружены полностью (пустой результат).")
+            cursor["complete"] = True
+            return
+
+        # Подписи идут от новых к старым; разрыв больше часа может означать пропуск транзакций
+        for sig in signatures:
+            if sig.get("blockTime"):
+                timestamp = datetime.fromtimestamp(sig["blockTime"])
+                if last_timestamp and abs((last_timestamp - timestamp).total_seconds()) > 3600:
+                    app.log(f"Обнаружен возможный пропуск транзакций: разрыв между {last_timestamp} и {timestamp}")
+                last_timestamp = timestamp
+        if cursor["newest"] is None:
+            cursor["newest"] = signatures[0]["signature"]
+            if on_newest is not None:
+                on_newest(cursor["newest"])
+        cursor["before"] = signatures[-1]["signature"]
+        app.log(f"Получено {len(signatures)} подписей, последняя: {cursor['before']}")
+        yield signatures
+        # Неполная страница — последняя: лишний запрос и REQUEST_DELAY перед ним только тратят квоту
+        if len(signatures) < SIGNATURE_PAGE_LIMIT:
+            app.log(f"Подписи для {mint_address} загружены полностью (неполная страница).")
+            cursor["complete"] = True
+            return
+    if max_pages is not None:
+        app.log(f"Достигнуто максимальное количество страниц ({max_pages}). Завершаем загрузку.")
+
+def run_ingestion(mint_address, token_id, decimals, symbol, app, cursor, until=None, max_pages=None,
+                  last_timestamp=None, on_newest=None, on_progress=None):
+    """Прогоняет загрузку через IngestionPipeline. Возвращает число сохранённых записей."""
+    def write(rows):
+        inserted = save_transactions(rows)
+        app.log(f"Сохранено {inserted} новых записей из {len(rows)}, последняя подпись: {rows[-1][1]}")
+        return inserted
+
+    pipeline = IngestionPipeline(
+        pager=lambda: signature_pages(mint_address, app, cursor, until, max_pages, last_timestamp, on_newest),
+        fetch=lambda sig, url_index: fetch_transaction(sig["signature"], app, url_index),
+        parse=lambda tx: parse_transaction(tx, mint_address, decimals, symbol, token_id, app),
+        write=write,
+        app=app,
+        url_index=cursor["url_index"],
+        on_progress=on_progress,
+        controller=app.controller,
+    )
+    return pipeline.run()
+
 @retry(
     stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=2, min=4, max=20),
+    wait=wait_rpc_backoff,
     retry=retry_if_exception_type(RPCUnreachableException),
     after=lambda retry_state: wait_for_rpc(retry_state.outcome._exception.app) if retry_state.outcome.failed else None
 )
 def fetch_historical_transactions(mint_address, token_id, app, url_index=0):
     app.log(f"Загрузка транзакций для {mint_address} через RPC")
+    saved_cursor = load_cursor(mint_address) or {}
+    if saved_cursor.get("last_signature"):
+        app.last_signature = saved_cursor["last_signature"]
+    if saved_cursor.get("backfill_complete"):
+        app.log(f"История {mint_address} уже загружена полностью, продолжаем с {app.last_signature}")
+        return url_index
     total_supply, decimals, symbol, url_index = fetch_token_metadata_from_helius(mint_address, app, url_index)
     if decimals is None:
         app.log(f"Не удалось получить decimals для {mint_address}. Пропускаем транзакции.")
         return url_index
-    before = None
-    max_iterations = 100
-    iteration = 0
-    last_timestamp = None
 
-    while iteration < max_iterations:
-        iteration += 1
-        app.log(f"Итерация {iteration}/{max_iterations} для загрузки транзакций...")
-        if app.paused:
-            app.log("Анализ приостановлен. Ожидание возобновления...")
-            app.pause_event.wait()
-        try:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getSignaturesForAddress",
-                "params": [mint_address, {"limit": 10, "before": before} if before else {"limit": 10}]
-            }
-            app.log(f"JSON-RPC запрос для транзакций: {json.dumps(payload, indent=2)}")
-            result, url_index = try_request(payload, app, url_index)
-            
-            if "result" not in result:
-                app.log(f"Отсутствует ключ 'result' в ответе для {mint_address}. Завершаем загрузку.")
-                break
-            if not result["result"]:
-                app.log(f"Исторические транзакции для {mint_address} загружены полностью (пустой результат).")
-                break
-
-            signatures = result["result"]
-            app.log(f"Получено {len(signatures)} подписей для обработки.")
-            for sig in signatures:
-                tx_payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "getTransaction",
-                    "params": [
-                        sig["signature"],
-                        {
-                            "encoding": "jsonParsed",
-                            "maxSupportedTransactionVersion": 0  # Добавляем поддержку версии транзакций
-                        }
-                    ]
-                }
-                app.log(f"JSON-RPC запрос для транзакции {sig['signature']}: {json.dumps(tx_payload, indent=2)}")
-                tx_result, url_index = try_request(tx_payload, app, url_index)
-                if "result" in tx_result and tx_result["result"]:
-                    tx = tx_result["result"]
-                    signature = tx["transaction"]["signatures"][0]
-                    block = tx["slot"]
-                    timestamp = datetime.fromtimestamp(tx["blockTime"] if tx["blockTime"] else int(time.time()))
-                    
-                    if last_timestamp and (last_timestamp - timestamp).total_seconds() > 3600:
-                        app.log(f"Обнаружен возможный пропуск транзакций: разрыв между {last_timestamp} и {timestamp}")
-                    
-                    last_timestamp = timestamp
-
-                    # Проверяем, является ли транзакция свопом
-                    swap_data = extract_swap_data(tx, mint_address, decimals, app)
-                    if swap_data:
-                        save_transaction(token_id, signature, block, timestamp, "SWAP", 
-                                       "unknown", "unknown", 
-                                       swap_data["token_amount"], symbol, swap_data["price_per_token"])
-                        app.log(f"Сохранён своп: {swap_data['token_amount']} токенов за {swap_data['price_per_token']} SOL")
-
-                    # Обрабатываем трансферы
-                    token_transfers = []
-                    if "meta" in tx and "postTokenBalances" in tx["meta"]:
-                        for balance in tx["meta"]["postTokenBalances"]:
-                            if balance["mint"] == mint_address:
-                                amount_raw = float(balance["uiTokenAmount"]["amount"])
-                                amount = amount_raw / (10 ** decimals) if decimals else amount_raw
-                                from_address = balance.get("owner", "unknown")
-                                to_address = "unknown"
-                                token_transfers.append({
-                                    "from_address": from_address,
-                                    "to_address": to_address,
-                                    "amount": amount
-                                })
-                    for transfer in token_transfers:
-                        save_transaction(token_id, signature, block, timestamp, "TRANSFER", 
-                                       transfer["from_address"], transfer["to_address"], 
-                                       transfer["amount"], symbol, None)
-                        app.log(f"Сохранён трансфер: {transfer['amount']} токенов от {transfer['from_address']} к {transfer['to_address']}")
-            app.last_signature = signatures[0]["signature"]
-            before = signatures[-1]["signature"]
-            app.log(f"Загружено {len(signatures)} исторических транзакций, последняя подпись: {app.last_signature}")
-        except requests.exceptions.Timeout:
-            app.log(f"Таймаут при загрузке транзакций для {mint_address} (ждали {REQUEST_TIMEOUT} секунд)")
-            raise RPCUnreachableException("RPC не отвечает") from None
-        except requests.exceptions.HTTPError as e:
-            app.log(f"HTTP ошибка загрузки транзакций для {mint_address}: {e}")
-            break
-        except Exception as e:
-            app.log(f"Ошибка загрузки транзакций для {mint_address}: {e}")
-            break
-        finally:
-            app.log("Задержка 10 секунд перед следующим запросом")
-            time.sleep(10)
-
-    if iteration >= max_iterations:
-        app.log(f"Достигнуто максимальное количество итераций ({max_iterations}). Завершаем загрузку.")
-    return url_index
+    # Продолжаем с сохранённого курсора: всё новее last_signature догрузит режим реального времени
+    cursor = {"url_index": url_index, "before": saved_cursor.get("backfill_before"),
+              "newest": saved_cursor.get("last_signature"), "complete": False}
+    if cursor["before"]:
+        app.log(f"Продолжаем историческую загрузку {mint_address} с подписи {cursor['before']}")
+
+    def on_newest(signature):
+        # Запоминаем до записи транзакций: граница между историей и реальным временем
+        save_cursor(mint_address, last_signature=signature)
+        app.last_signature = signature
+
+    try:
+        saved = run_ingestion(mint_address, token_id, decimals, symbol, app, cursor, max_pages=MAX_HISTORY_PAGES,
+                              on_newest=on_newest,
+                              on_progress=lambda signature: save_cursor(mint_address, backfill_before=signature))
+        if cursor["complete"]:
+            save_cursor(mint_address, backfill_complete=1)
+        app.log(f"Загружено {saved} записей исторических транзакций для {mint_address}")
+    except IngestionCancelled:
+        app.log(f"Историческая загрузка {mint_address} остановлена, курсор сохранён.")
+        raise
+    except requests.exceptions.Timeout:
+        app.log(f"Таймаут при загрузке транзакций для {mint_address} (ждали {REQUEST_TIMEOUT} секунд)")
+        raise RPCUnreachableException("RPC не отвечает", app) from None
+    except Exception as e:
+        app.log(f"Ошибка загрузки транзакций для {mint_address}: {e}")
+    return cursor["url_index"]
+
+def wait_real_time_delay(app):
+    """Пауза между опросами реального времени; цикл в main.py своей задержки не делает."""
+    app.log(f"Задержка {REQUEST_DELAY} секунд перед следующим запросом реального времени")
+    with metrics.timed("sleep", loop="real_time"):
+        app.controller.sleep(REQUEST_DELAY)
 
 @retry(
     stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=2, min=4, max=20),
+    wait=wait_rpc_backoff,
     retry=retry_if_exception_type(RPCUnreachableException),
     after=lambda retry_state: wait_for_rpc(retry_state.outcome._exception.app) if retry_state.outcome.failed else None
 )
 def fetch_real_time_transactions(mint_address, token_id, app, url_index=0):
     if not app.last_signature:
         app.log("Нет начальной подписи для реального времени. Завершите загрузку исторических данных.")
+        wait_real_time_delay(app)
         return url_index
     total_supply, decimals, symbol, url_index = fetch_token_metadata_from_helius(mint_address, app, url_index)
     if decimals is None:
         app.log(f"Не удалось получить decimals для {mint_address}. Пропускаем обновления.")
+        wait_real_time_delay(app)
         return url_index
     last_timestamp = None
+    cursor = {"url_index": url_index, "before": None, "newest": None, "complete": False}
     try:
         # Получаем последнюю временную метку из базы для контроля пропусков
-        conn, cursor = get_db_connection()
-        cursor.execute('''
+        conn, db_cursor = get_db_connection()
+        db_cursor.execute('''
             SELECT timestamp
             FROM transactions
             WHERE token_id = ?
             ORDER BY timestamp DESC
             LIMIT 1
         ''', (token_id,))
-        last_tx = cursor.fetchone()
+        last_tx = db_cursor.fetchone()
         if last_tx:
             last_timestamp = parse_timestamp(last_tx[0])
-        conn.close()
+        db_cursor.close()  # Соединение общее, закрываем только курсор
 
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getSignaturesForAddress",
-            "params": [mint_address, {"limit": 10, "until": app.last_signature}]
-        }
-        app.log(f"JSON-RPC запрос для транзакций в реальном времени: {json.dumps(payload, indent=2)}")
-        result, url_index = try_request(payload, app, url_index)
-        if "result" not in result or not result["result"]:
+        # Страницы идут от новых к старым до app.last_signature, поэтому всплеск новых транзакций не теряется
+        saved = run_ingestion(mint_address, token_id, decimals, symbol, app, cursor,
+                              until=app.last_signature, last_timestamp=last_timestamp)
+        # Курсор сдвигается только после записи всех новых транзакций и только если пейджер дошёл
+        # до app.last_signature; иначе при следующем опросе они будут запрошены снова
+        if cursor["newest"] and cursor["complete"]:
+            save_cursor(mint_address, last_signature=cursor["newest"])
+            app.last_signature = cursor["newest"]
+            app.log(f"Сохранено {saved} новых записей, новая последняя подпись: {app.last_signature}")
+        elif cursor["newest"]:
+            app.log(f"Опрос для {mint_address} прерван до конца, курсор реального времени не сдвинут")
+        else:
             app.log(f"Нет новых транзакций для {mint_address} с момента {app.last_signature}")
-            return url_index
-        signatures = result["result"]
-        for sig in signatures:
-            tx_payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getTransaction",
-                "params": [
-                    sig["signature"],
-                    {
-                        "encoding": "jsonParsed",
-                        "maxSupportedTransactionVersion": 0  # Добавляем поддержку версии транзакций
-                    }
-                ]
-            }
-            app.log(f"JSON-RPC запрос для транзакции {sig['signature']}: {json.dumps(tx_payload, indent=2)}")
-            tx_result, url_index = try_request(tx_payload, app, url_index)
-            if "result" in tx_result and tx_result["result"]:
-                tx = tx_result["result"]
-                signature = tx["transaction"]["signatures"][0]
-                block = tx["slot"]
-                timestamp = datetime.fromtimestamp(tx["blockTime"] if tx["blockTime"] else int(time.time()))
-                
-                if last_timestamp and (timestamp - last_timestamp).total_seconds() > 3600:
-                    app.log(f"Обнаружен возможный пропуск транзакций в реальном времени: разрыв между {last_timestamp} и {timestamp}")
-                
-                last_timestamp = timestamp
-
-                # Проверяем, является ли транзакция свопом
-                swap_data = extract_swap_data(tx, mint_address, decimals, app)
-                if swap_data:
-                    save_transaction(token_id, signature, block, timestamp, "SWAP", 
-                                   "unknown", "unknown", 
-                                   swap_data["token_amount"], symbol, swap_data["price_per_token"])
-                    app.log(f"Сохранён своп: {swap_data['token_amount']} токенов за {swap_data['price_per_token']} SOL")
-
-                # Обрабатываем трансферы
-                token_transfers = []
-                if "meta" in tx and "postTokenBalances" in tx["meta"]:
-                    for balance in tx["meta"]["postTokenBalances"]:
-                        if balance["mint"] == mint_address:
-                            amount_raw = float(balance["uiTokenAmount"]["amount"])
-                            amount = amount_raw / (10 ** decimals) if decimals else amount_raw
-                            from_address = balance.get("owner", "unknown")
-                            to_address = "unknown"
-                            token_transfers.append({
-                                "from_address": from_address,
-                                "to_address": to_address,
-                                "amount": amount
-                            })
-                for transfer in token_transfers:
-                    save_transaction(token_id, signature, block, timestamp, "TRANSFER", 
-                                   transfer["from_address"], transfer["to_address"], 
-                                   transfer["amount"], symbol, None)
-                    app.log(f"Новая транзакция: {transfer['amount']} токенов от {transfer['from_address']} к {transfer['to_address']}")
-        if signatures:
-            app.last_signature = signatures[0]["signature"]
-            app.log(f"Обработано {len(signatures)} новых транзакций, новая последняя подпись: {app.last_signature}")
+    except IngestionCancelled:
+        app.log(f"Обновление в реальном времени для {mint_address} остановлено.")
+        raise
     except requests.exceptions.Timeout:
         app.log(f"Таймаут при получении данных в реальном времени для {mint_address} (ждали {REQUEST_TIMEOUT} секунд)")
-        raise RPCUnreachableException("RPC не отвечает") from None
+        raise RPCUnreachableException("RPC не отвечает", app) from None
     except Exception as e:
         app.log(f"Ошибка получения данных в реальном времени для {mint_address}: {e}")
-    finally:
-        app.log("Задержка 10 секунд перед следующим запросом реального времени")
-        time.sleep(10)
-    return url_index
\ No newline at end of file
+    wait_real_time_delay(app)
+    return cursor["url_index"]
@@ -0,0 +1,201 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def load_fixtures(path):
+    """Загружает записанные фикстуры (формат benchmarks.synthetic.make_fixtures)."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixtures(fixtures, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f)
+
+
+def record_fixtures(mint_address, app, pages=1, limit=10):
+    """Записывает фикстуры с реального RPC через api.try_request (расходует квоту!)."""
+    from api import try_request
+    result, url_index = try_request({"jsonrpc": "2.0", "id": 1, "method": "getTokenSupply", "params": [mint_address]}, app)
+    fixtures = {"mint": mint_address, "token_supply": result["result"]["value"], "signatures": [], "transactions": {}}
+    before = None
+    for _ in range(pages):
+        options = {"limit": limit, "before": before} if before else {"limit": limit}
+        result, url_index = try_request(
+            {"jsonrpc": "2.0", "id": 1, "method": "getSignaturesForAddress", "params": [mint_address, options]},
+            app, url_index,
+        )
+        if not result.get("result"):
+            break
+        for sig in result["result"]:
+            tx_result, url_index = try_request(
+                {"jsonrpc": "2.0", "id": 1, "method": "getTransaction",
+                 "params": [sig["signature"], {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}]},
+                app, url_index,
+            )
+            fixtures["signatures"].append(sig)
+            fixtures["transactions"][sig["signature"]] = tx_result.get("result")
+        before = result["result"][-1]["signature"]
+    return fixtures
+
+
+class MockRPCServer:
+    """Локальный JSON-RPC сервер Solana, отвечающий из фикстур.
+
+    latency/jitter задают задержку ответа в секундах, error_rate — долю ответов 500,
+    rate_limit_rate — долю ответов 429. Подписи в фикстурах упорядочены от новых к старым;
+    advance() открывает следующие подписи для имитации новых блоков в реальном времени.
+    """
+
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 visible=None, host="127.0.0.1", port=0, seed=0):
+        self.fixtures = fixtures
+        self.signatures = fixtures["signatures"]
+        self.index = {sig["signature"]: i for i, sig in enumerate(self.signatures)}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        # Первые (самые новые) подписи скрыты, пока их не откроет advance()
+        self.head = min(max(0, len(self.signatures) - visible), len(self.signatures)) if visible is not None else 0
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def advance(self, count):
+        """Открывает count новых подписей."""
+        with self._lock:
+            self.head = max(0, self.head - count)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-rpc", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _roll(self):
+        """Возвращает HTTP-статус сбоя (429/500) или None для нормального ответа."""
+        with self._lock:
+            self.requests += 1
+            value = self._rng.random()
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if value < self.rate_limit_rate:
+            return 429
+        if value < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def handle(self, method, params):
+        if method == "getHealth":
+            return "ok"
+        if method == "getTokenSupply":
+            return {"context": {"slot": self.signatures[0]["slot"] if self.signatures else 0},
+                    "value": self.fixtures["token_supply"]}
+        if method == "getTransaction":
+            return self.fixtures["transactions"].get(params[0])
+        if method == "getSignaturesForAddress":
+            options = params[1] if len(params) > 1 else {}
+            limit = min(options.get("limit", 1000), 1000)
+            with self._lock:
+                start = self.head
+            if options.get("before") in self.index:
+                start = max(start, self.index[options["before"]] + 1)
+            end = len(self.signatures)
+            if options.get("until") in self.index:
+                end = self.index[options["until"]]
+            return self.signatures[start:min(end, start + limit)]
+        raise KeyError(method)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, как у реальных провайдеров
+            disable_nagle_algorithm = True  # иначе заголовки и тело уходят с задержкой delayed ACK (~40 мс)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status = server._roll()
+                if status == 429:
+                    self._reply(429, {"jsonrpc": "2.0", "id": 1, "error": {"code": 429, "message": "Too many requests"}},
+                                {"Retry-After": "1"})
+                    return
+                if status == 500:
+                    self._reply(500, {"jsonrpc": "2.0", "id": 1, "error": {"code": -32603, "message": "Internal error"}})
+                    return
+                request = json.loads(body)
+                try:
+                    result = server.handle(request["method"], request.get("params", []))
+                    payload = {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+                except KeyError:
+                    payload = {"jsonrpc": "2.0", "id": request.get("id"),
+                               "error": {"code": -32601, "message": "Method not found"}}
+                self._reply(200, payload)
+
+            def _reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный mock Solana JSON-RPC для бенчмарков")
+    parser.add_argument("--fixtures", help="JSON с фикстурами; по умолчанию генерируются синтетические")
+    parser.add_argument("--count", type=int, default=500, help="число синтетических транзакций")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        from benchmarks.synthetic import make_fixtures
+        fixtures = make_fixtures(args.count)
+    server = MockRPCServer(fixtures, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, port=args.port)
+    server.start()
+    print(f"Mock RPC для {fixtures['mint']} слушает {server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
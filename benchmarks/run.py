@@ -0,0 +1,319 @@
+"""Бенчмарки ингестии на локальном mock RPC.
+
+Запуск из корня репозитория:
+    python -m benchmarks.run                          # все сценарии
+    python -m benchmarks.run backfill --count 1000 --latency 0.02
+    python -m benchmarks.run --json out.json --baseline base.json --threshold 0.15
+
+Каждый сценарий выполняется в отдельном процессе, чтобы пиковый RSS не смешивался между ними.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from queue import Empty
+
+from lifecycle import IngestionController
+
+SCENARIOS = ("backfill", "follow", "clustering")
+FOLLOW_BATCH = 10  # Новых подписей за один опрос в сценарии follow
+
+
+class HeadlessApp:
+    """Минимальная замена TokenAnalyzerApp для запуска функций api.py без GUI."""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.is_scanning = True
+        self.controller = IngestionController()
+        self.last_signature = None
+        self.current_mint_address = None
+        self.helius_api_key = None
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+
+def _peak_rss():
+    """Пиковый RSS процесса в байтах (None, если платформа не позволяет его узнать)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _install_timing_client():
+    """Подменяет общий RPCClient на вариант, записывающий задержку каждого запроса и число загруженных транзакций."""
+    import rpc_client
+
+    class TimingClient(rpc_client.RPCClient):
+        def __init__(self):
+            super().__init__()
+            self.latencies = []
+            self.transactions = 0
+            self._count_lock = threading.Lock()
+
+        def request(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                response = super().request(*args, **kwargs)
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+            if kwargs.get("rpc_method") == "getTransaction" and response.status_code == 200:
+                with self._count_lock:
+                    self.transactions += 1
+            return response
+
+    rpc_client.close_client()
+    rpc_client._client = TimingClient()
+    return rpc_client._client
+
+
+def _setup(options, tmpdir):
+    """Готовит изолированную БД, mock RPC и api.py для сценария."""
+    import api
+    import metrics
+    from database import init_db
+    from benchmarks.mock_rpc import MockRPCServer, load_fixtures
+    from benchmarks.synthetic import make_fixtures
+
+    init_db(os.path.join(tmpdir, "bench.db"))
+    metrics.reset()
+    api.REQUEST_DELAY = options["delay"]
+    if options.get("fixtures"):
+        fixtures = load_fixtures(options["fixtures"])
+    else:
+        fixtures = make_fixtures(options["count"], seed=options["seed"])
+    server = MockRPCServer(
+        fixtures, latency=options["latency"], jitter=options["jitter"], error_rate=options["error_rate"],
+        rate_limit_rate=options["rate_limit_rate"], visible=options.get("visible"), seed=options["seed"],
+    ).start()
+    # Несколько URL на один сервер: у try_request есть куда переключаться при 429/500
+    api.RPC_URLS[:] = [f"{server.url}?rpc={i}" for i in range(options["endpoints"])]
+    return api, fixtures, server
+
+
+def _count_rows():
+    from database import get_db_connection
+    _, cursor = get_db_connection()
+    cursor.execute("SELECT COUNT(*) FROM transactions")
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+
+def bench_backfill(options, tmpdir):
+    """Историческая загрузка: fetch_historical_transactions по всем фикстурам."""
+    from database import load_cursor
+
+    api, fixtures, server = _setup(options, tmpdir)
+    client = _install_timing_client()
+    app = HeadlessApp(options["verbose"])
+    try:
+        start = time.perf_counter()
+        api.fetch_historical_transactions(fixtures["mint"], 1, app)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+    # fetch_historical_transactions глотает ошибки RPC, поэтому полноту проверяем по сохранённому курсору
+    complete = bool(load_cursor(fixtures["mint"]).get("backfill_complete"))
+    return {"transactions": client.transactions, "expected": len(fixtures["signatures"]), "complete": complete,
+            "rows": _count_rows(), "elapsed": elapsed, "latencies": client.latencies, "requests": server.requests}
+
+
+def bench_follow(options, tmpdir):
+    """Режим реального времени: каждые rounds новых подписей догружаются fetch_real_time_transactions."""
+    batch = FOLLOW_BATCH
+    options = dict(options, visible=options["count"] - options["rounds"] * batch)
+    api, fixtures, server = _setup(options, tmpdir)
+    client = _install_timing_client()
+    app = HeadlessApp(options["verbose"])
+    app.last_signature = fixtures["signatures"][server.head]["signature"]
+    try:
+        start = time.perf_counter()
+        for _ in range(options["rounds"]):
+            server.advance(batch)
+            api.fetch_real_time_transactions(fixtures["mint"], 1, app)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+    # Курсор реального времени должен дойти до самой новой подписи фикстур
+    complete = app.last_signature == fixtures["signatures"][0]["signature"]
+    return {"transactions": client.transactions, "expected": options["rounds"] * batch, "complete": complete,
+            "rows": _count_rows(), "elapsed": elapsed, "latencies": client.latencies, "requests": server.requests}
+
+
+def bench_clustering(options, tmpdir):
+    """Кластеризация кошельков: find_connected_wallets по синтетическому графу трансферов."""
+    from database import init_db, get_db_connection
+    from benchmarks.synthetic import make_transfer_rows
+    from utils import find_connected_wallets
+
+    init_db(os.path.join(tmpdir, "bench.db"))
+    rows = make_transfer_rows(options["rows"], options["wallets"], seed=options["seed"])
+    conn, cursor = get_db_connection()
+    cursor.executemany('''
+        INSERT OR IGNORE INTO transactions (token_id, signature, block, timestamp, type, from_address, to_address, amount, symbol, value_sol, is_initial_recipient)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    cursor.close()
+    del rows
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(options["repeat"]):
+        call_start = time.perf_counter()
+        groups = find_connected_wallets(1)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    # Каждая синтетическая строка — отдельная транзакция-трансфер
+    return {"transactions": options["rows"] * options["repeat"], "elapsed": elapsed, "latencies": latencies,
+            "groups": len(groups)}
+
+
+def _run_scenario(name, options, queue):
+    """Точка входа дочернего процесса: выполняет сценарий и отправляет сводку в очередь."""
+    import metrics
+    from database import close_db
+    with tempfile.TemporaryDirectory() as tmpdir:
+        raw = globals()[f"bench_{name}"](options, tmpdir)
+        close_db()
+    latencies = raw.pop("latencies")
+    complete = raw.pop("complete", True)
+    result = {
+        "scenario": name,
+        # Прерванная загрузка не измерение: tx/с по её остаткам нельзя сравнивать с baseline
+        "failed": None if complete else f"загрузка не завершена: {raw['transactions']} из {raw['expected']} транзакций",
+        "tx_per_s": raw["transactions"] / raw["elapsed"] if raw["elapsed"] and complete else None,
+        "p50_ms": _percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p99_ms": _percentile(latencies, 0.99) * 1000 if latencies else None,
+        "peak_rss_mb": _peak_rss() / 2 ** 20 if _peak_rss() else None,
+        "summary": metrics.summary(),
+    }
+    result.update(raw)
+    queue.put(result)
+
+
+def run(name, options):
+    # spawn: чистый процесс без унаследованной памяти родителя, одинаково на Linux и Windows
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_scenario, args=(name, options, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"Сценарий {name} завершился с кодом {process.exitcode}")
+    process.join()
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Возвращает список регрессий относительно baseline (ухудшение больше threshold)."""
+    regressions = []
+    previous = {r["scenario"]: r for r in baseline}
+    for result in results:
+        base = previous.get(result["scenario"])
+        if not base or result.get("failed") or base.get("failed"):
+            continue
+        checks = (("tx_per_s", -1), ("p99_ms", 1), ("peak_rss_mb", 1))
+        for key, direction in checks:
+            old, new = base.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * direction
+            if change > threshold:
+                regressions.append(f"{result['scenario']}.{key}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+    return regressions
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки ингестии на локальном mock RPC")
+    parser.add_argument("scenarios", nargs="*", help=f"сценарии: {', '.join(SCENARIOS)} (по умолчанию все)")
+    parser.add_argument("--count", type=int, default=500, help="число синтетических транзакций (backfill/follow)")
+    parser.add_argument("--fixtures", help="JSON с записанными фикстурами вместо синтетических")
+    parser.add_argument("--rounds", type=int, default=20, help="число опросов в сценарии follow")
+    parser.add_argument("--rows", type=int, default=50_000, help="число трансферов для clustering")
+    parser.add_argument("--wallets", type=int, default=5_000, help="число кошельков для clustering")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов find_connected_wallets")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка mock RPC, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--endpoints", type=int, default=3, help="число RPC URL (все указывают на mock)")
+    parser.add_argument("--delay", type=float, default=0.0, help="задержка между страницами (REQUEST_DELAY), с")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON с прошлыми результатами для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.10, help="допустимое ухудшение относительно baseline")
+    parser.add_argument("--metrics", action="store_true", help="печатать сводку metrics по каждому сценарию")
+    parser.add_argument("--verbose", action="store_true", help="печатать лог api.py")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    if "follow" in args.scenarios and args.count <= args.rounds * FOLLOW_BATCH:
+        # Нужна хотя бы одна видимая подпись, от которой follow начнёт опросы
+        parser.error(f"для follow нужно --count > --rounds * {FOLLOW_BATCH} "
+                     f"({args.count} <= {args.rounds * FOLLOW_BATCH})")
+    for name in ("count", "rounds", "rows", "wallets", "repeat", "endpoints"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name} должен быть положительным")
+    if args.wallets < 2:
+        parser.error("--wallets должен быть не меньше 2")
+
+    options = {k: v for k, v in vars(args).items() if k not in ("scenarios", "json", "baseline", "threshold", "metrics")}
+    results = []
+    print(f"{'сценарий':<12} {'tx/с':>10} {'p50, мс':>9} {'p99, мс':>9} {'RSS, МБ':>9} {'время, с':>9}")
+    for name in args.scenarios:
+        result = run(name, options)
+        results.append(result)
+        print(f"{name:<12} {_fmt(result['tx_per_s'], '10.1f')} {_fmt(result['p50_ms'], '9.2f')} "
+              f"{_fmt(result['p99_ms'], '9.2f')} {_fmt(result['peak_rss_mb'], '9.1f')} {result['elapsed']:9.2f}")
+        if result["failed"]:
+            print(f"ОШИБКА: {name}: {result['failed']}")
+        if args.metrics:
+            print(result["summary"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    failed = any(result["failed"] for result in results)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ: {line}")
+        return 1 if regressions or failed else 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import random
+from datetime import datetime, timedelta
+
+RAYDIUM_PROGRAM_ID = "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSce"
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+DEFAULT_MINT = "So1anaBenchMint11111111111111111111111111111"
+
+
+def make_base58(rng, length):
+    return "".join(rng.choice(BASE58_ALPHABET) for _ in range(length))
+
+
+def make_signature(rng):
+    """Случайная подпись транзакции в base58 (88 символов, как у Solana)."""
+    return make_base58(rng, 88)
+
+
+def make_address(rng):
+    return make_base58(rng, 44)
+
+
+def make_transaction(rng, signature, slot, block_time, mint_address, decimals, wallets, swap=False, accounts=8):
+    """Строит jsonParsed ответ getTransaction в том виде, который разбирает api.py."""
+    owners = rng.sample(wallets, k=min(len(wallets), 2))
+    post_token_balances = []
+    for index, owner in enumerate(owners):
+        amount = rng.randint(1, 10 ** 6) * 10 ** decimals
+        post_token_balances.append({
+            "accountIndex": index + 1,
+            "mint": mint_address,
+            "owner": owner,
+            "uiTokenAmount": {"amount": str(amount), "decimals": decimals, "uiAmount": amount / 10 ** decimals},
+        })
+    pre_balances = [rng.randint(10 ** 6, 10 ** 12) for _ in range(accounts)]
+    post_balances = list(pre_balances)
+    post_balances[0] -= rng.randint(5000, 10 ** 10)
+    instructions = [{"programId": "11111111111111111111111111111111", "parsed": {"type": "transfer", "info": {}}}]
+    if swap:
+        instructions.append({
+            "programId": RAYDIUM_PROGRAM_ID,
+            "parsed": {"type": "swap", "info": {"amountIn": str(rng.randint(1, 10 ** 9))}},
+        })
+    return {
+        "slot": slot,
+        "blockTime": block_time,
+        "transaction": {
+            "signatures": [signature],
+            "message": {
+                "accountKeys": [{"pubkey": make_address(rng), "signer": i == 0, "writable": True} for i in range(accounts)],
+                "instructions": [],
+            },
+        },
+        "meta": {
+            "err": None,
+            "fee": 5000,
+            "preBalances": pre_balances,
+            "postBalances": post_balances,
+            "innerInstructions": [{"index": 0, "instructions": instructions}],
+            "preTokenBalances": [],
+            "postTokenBalances": post_token_balances,
+            "logMessages": [f"Program log: instruction {i}" for i in range(10)],
+        },
+        "version": 0,
+    }
+
+
+def make_fixtures(count=500, mint_address=DEFAULT_MINT, decimals=6, swap_ratio=0.3, wallets=200, seed=42):
+    """Генерирует набор фикстур для MockRPCServer: подписи (от новых к старым) и транзакции."""
+    rng = random.Random(seed)
+    wallet_pool = [make_address(rng) for _ in range(wallets)]
+    slot = 300_000_000
+    block_time = int(datetime(2025, 1, 1).timestamp())
+    signatures = []
+    transactions = {}
+    for _ in range(count):
+        signature = make_signature(rng)
+        slot -= rng.randint(1, 20)
+        block_time -= rng.randint(1, 30)
+        transactions[signature] = make_transaction(
+            rng, signature, slot, block_time, mint_address, decimals, wallet_pool, swap=rng.random() < swap_ratio
+        )
+        signatures.append({
+            "signature": signature,
+            "slot": slot,
+            "blockTime": block_time,
+            "err": None,
+            "memo": None,
+            "confirmationStatus": "finalized",
+        })
+    return {
+        "mint": mint_address,
+        "token_supply": {"amount": str(10 ** 9 * 10 ** decimals), "decimals": decimals, "uiAmountString": str(10 ** 9)},
+        "signatures": signatures,
+        "transactions": transactions,
+    }
+
+
+def make_transfer_rows(count=50_000, wallets=5_000, token_id=1, seed=42):
+    """Генерирует строки для таблицы transactions со связями кошельков (для бенчмарка кластеризации)."""
+    rng = random.Random(seed)
+    wallet_pool = [make_address(rng) for _ in range(wallets)]
+    start = datetime(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        from_address, to_address = rng.sample(wallet_pool, 2)
+        rows.append((
+            token_id, make_signature(rng), 300_000_000 + i, str(start + timedelta(seconds=i)), "TRANSFER",
+            from_address, to_address, rng.random() * 1000, "BENCH", None, 0,
+        ))
+    return rows
@@ -1,12 +1,16 @@
 import sqlite3
 import threading
+from itertools import groupby
 import os
+import time
+import metrics
 
-# Указываем новый путь к базе данных
-DB_PATH = r"D:\auto\burn\token_transactions.db"
+# Указываем новый путь к базе данных (можно переопределить переменной окружения DB_PATH)
+DB_PATH = os.getenv("DB_PATH", r"D:\auto\burn\token_transactions.db")
 
 # Проверяем, существует ли директория, и создаем её, если нет
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+if os.path.dirname(DB_PATH):
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
 # Глобальное соединение и блокировка
 _conn = None
@@ -15,7 +19,8 @@ _lock = threading.Lock()
 def init_db(db_path=DB_PATH):
     """Инициализирует базу данных, создаёт таблицу transactions, если она не существует."""
     global _conn
-    _conn = sqlite3.connect(db_path, timeout=10)  # Таймаут 10 секунд
+    # Соединение создаётся в GUI-потоке, а пишут в него рабочие потоки; доступ сериализуется через _lock
+    _conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)  # Таймаут 10 секунд
     cursor = _conn.cursor()
     
     # Создаём таблицу, если она ещё не существует
@@ -36,6 +41,17 @@ def init_db(db_path=DB_PATH):
         )
     ''')
     
+    # Курсоры загрузки: с них продолжается работа после остановки или перезапуска
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingestion_cursors (
+            mint_address TEXT PRIMARY KEY,
+            backfill_before TEXT,  -- Самая старая подпись, до которой история сохранена без пропусков
+            backfill_complete INTEGER DEFAULT 0,
+            last_signature TEXT,  -- Самая новая подпись, с которой продолжает режим реального времени
+            updated_at DATETIME
+        )
+    ''')
+
     # Проверяем, есть ли столбец is_initial_recipient
     cursor.execute("PRAGMA table_info(transactions)")
     columns = [col[1] for col in cursor.fetchall()]
@@ -52,19 +68,86 @@ def init_db(db_path=DB_PATH):
 
 def save_transaction(token_id, signature, block, timestamp, type_, from_address, to_address, amount, symbol, value_sol=None, is_initial_recipient=0):
     """Сохраняет транзакцию в базу данных с синхронизацией."""
+    wait_start = time.perf_counter()
     with _lock:  # Синхронизируем доступ
+        metrics.observe("ingest_stage_seconds", time.perf_counter() - wait_start, stage="db_lock_wait")
         cursor = _conn.cursor()
         try:
             cursor.execute('''
                 INSERT OR IGNORE INTO transactions (token_id, signature, block, timestamp, type, from_address, to_address, amount, symbol, value_sol, is_initial_recipient)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (token_id, signature, block, str(timestamp), type_, from_address, to_address, amount, symbol, value_sol, is_initial_recipient))
-            _conn.commit()
+            inserted = cursor.rowcount  # 0, если подпись уже есть в базе (INSERT OR IGNORE)
+            with metrics.timed("db_commit"):
+                _conn.commit()
+            if inserted > 0:
+                metrics.inc("transactions_saved_total", inserted, type=type_)
         except sqlite3.OperationalError as e:
             print(f"Ошибка базы данных при сохранении транзакции {signature}: {e}")
         except Exception as e:
             print(f"Неизвестная ошибка при сохранении транзакции {signature}: {e}")
 
+def save_transactions(rows):
+    """Сохраняет пачку транзакций одним коммитом. rows — кортежи в порядке столбцов save_transaction.
+
+    Возвращает число реально вставленных строк: строки с уже существующей подписью игнорируются.
+    """
+    wait_start = time.perf_counter()
+    with _lock:  # Синхронизируем доступ
+        metrics.observe("ingest_stage_seconds", time.perf_counter() - wait_start, stage="db_lock_wait")
+        cursor = _conn.cursor()
+        try:
+            inserted_by_type = {}
+            # Идём подряд идущими группами одного типа, сохраняя порядок строк (при одинаковой подписи побеждает первая)
+            for type_, group in groupby(rows, key=lambda row: row[4]):
+                changes = _conn.total_changes
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO transactions (token_id, signature, block, timestamp, type, from_address, to_address, amount, symbol, value_sol, is_initial_recipient)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', list(group))
+                inserted_by_type[type_] = inserted_by_type.get(type_, 0) + _conn.total_changes - changes
+            with metrics.timed("db_commit"):
+                _conn.commit()
+            for type_, inserted in inserted_by_type.items():
+                if inserted:
+                    metrics.inc("transactions_saved_total", inserted, type=type_)
+            return sum(inserted_by_type.values())
+        except sqlite3.Error as e:
+            print(f"Ошибка базы данных при сохранении {len(rows)} транзакций: {e}")
+            # Уже вставленные строки пачки иначе закоммитил бы следующий save_cursor или пачка мимо счётчиков
+            _conn.rollback()
+            raise
+
+def load_cursor(mint_address):
+    """Возвращает сохранённый курсор загрузки токена (словарь) или None."""
+    with _lock:
+        cursor = _conn.cursor()
+        cursor.execute('''
+            SELECT backfill_before, backfill_complete, last_signature
+            FROM ingestion_cursors
+            WHERE mint_address = ?
+        ''', (mint_address,))
+        row = cursor.fetchone()
+        cursor.close()
+    if not row:
+        return None
+    return {"backfill_before": row[0], "backfill_complete": bool(row[1]), "last_signature": row[2]}
+
+def save_cursor(mint_address, **fields):
+    """Обновляет поля курсора загрузки токена (backfill_before, backfill_complete, last_signature)."""
+    columns = [name for name in ("backfill_before", "backfill_complete", "last_signature") if name in fields]
+    values = [fields[name] for name in columns]
+    updates = ", ".join(f"{name} = excluded.{name}" for name in columns + ["updated_at"])
+    with _lock:
+        cursor = _conn.cursor()
+        cursor.execute(f'''
+            INSERT INTO ingestion_cursors (mint_address, {", ".join(columns + ["updated_at"])})
+            VALUES (?, {", ".join("?" for _ in columns)}, CURRENT_TIMESTAMP)
+            ON CONFLICT(mint_address) DO UPDATE SET {updates}
+        ''', [mint_address] + values)
+        _conn.commit()
+        cursor.close()
+
 def get_db_connection():
     """Возвращает глобальное соединение и курсор для базы данных."""
     return _conn, _conn.cursor()
@@ -0,0 +1,93 @@
+import time
+import threading
+
+_POLL_INTERVAL = 0.5
+
+
+class IngestionCancelled(Exception):
+    """Исключение, которым воркер выходит из работы после остановки анализа."""
+    pass
+
+
+class IngestionController:
+    """Общий для всех воркеров ингестии жизненный цикл: остановка, пауза и учёт потоков.
+
+    Воркеры вызывают checkpoint() перед каждым запросом к RPC и sleep() вместо time.sleep(),
+    поэтому остановка и пауза срабатывают не позже, чем через один запрос.
+    """
+
+    def __init__(self):
+        self._stop_event = threading.Event()
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._threads = set()
+        self._lock = threading.Lock()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    @property
+    def paused(self):
+        return not self._resume_event.is_set()
+
+    def start(self):
+        """Сбрасывает состояние перед новым запуском анализа."""
+        self._stop_event.clear()
+        self._resume_event.set()
+
+    def stop(self):
+        """Просит все воркеры завершиться; приостановленные воркеры тоже просыпаются."""
+        self._stop_event.set()
+        self._resume_event.set()
+
+    def pause(self):
+        self._resume_event.clear()
+
+    def resume(self):
+        self._resume_event.set()
+
+    def checkpoint(self):
+        """Точка отмены: ждёт снятия паузы и бросает IngestionCancelled после stop()."""
+        while not self._resume_event.wait(_POLL_INTERVAL):
+            pass
+        if self._stop_event.is_set():
+            raise IngestionCancelled("Анализ остановлен")
+
+    def sleep(self, seconds):
+        """Прерываемая задержка: бросает IngestionCancelled, если во время ожидания вызван stop()."""
+        if self._stop_event.wait(seconds):
+            raise IngestionCancelled("Анализ остановлен")
+        self.checkpoint()
+
+    def spawn(self, target, *args, name=None):
+        """Запускает воркер в отдельном потоке и учитывает его до завершения."""
+        def run():
+            try:
+                target(*args)
+            except IngestionCancelled:
+                pass
+            finally:
+                with self._lock:
+                    self._threads.discard(threading.current_thread())
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        with self._lock:
+            self._threads.add(thread)
+        thread.start()
+        return thread
+
+    @property
+    def busy(self):
+        """True, пока жив хотя бы один воркер."""
+        with self._lock:
+            return any(thread.is_alive() for thread in self._threads)
+
+    def join(self, timeout=None):
+        """Ждёт завершения всех воркеров. Возвращает True, если все завершились за timeout."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()) if deadline is not None else None)
+        return not self.busy
@@ -4,9 +4,12 @@ import threading
 import time
 from PyQt5.QtWidgets import QApplication, QMainWindow, QTextEdit, QLineEdit, QPushButton, QVBoxLayout, QWidget
 from PyQt5.QtCore import QTimer, pyqtSignal, pyqtSlot, QThread, Qt  # Добавляем импорт Qt
-from database import init_db, save_transaction, close_db
+from database import init_db, save_transaction, close_db, DB_PATH
 from api import fetch_historical_transactions, fetch_token_metadata, fetch_real_time_transactions
 from config import HELIUS_API_KEY
+from rpc_client import close_client, REQUEST_TIMEOUT
+from lifecycle import IngestionController, IngestionCancelled
+import metrics
 
 class TokenAnalyzerApp(QMainWindow):
     log_signal = pyqtSignal(str)
@@ -15,16 +18,19 @@ class TokenAnalyzerApp(QMainWindow):
         super().__init__()
         self.log_buffer = []
         self.initUI()
-        self.paused = False
         self.is_scanning = False  # Флаг для отслеживания состояния сканирования
-        self.pause_event = threading.Event()
-        self.pause_event.set()
+        self.controller = IngestionController()  # Остановка и пауза для всех потоков загрузки
         self.helius_api_key = HELIUS_API_KEY
         self.last_signature = None
         self.current_mint_address = None
         self.current_url_index = 0  # Индекс текущего RPC URL
         init_db()
-        self.log("База данных инициализирована по пути " + os.path.abspath(r"D:\auto\burn\token_transactions.db"))
+        try:
+            if metrics.start_metrics_server():
+                self.log(f"Метрики доступны по адресу http://{metrics.METRICS_HOST}:{metrics.METRICS_PORT}/metrics")
+        except OSError as e:
+            self.log(f"Не удалось запустить эндпоинт метрик: {e}")
+        self.log("База данных инициализирована по пути " + os.path.abspath(DB_PATH))
 
     def initUI(self):
         self.setWindowTitle("Token Analyzer")
@@ -57,16 +63,17 @@ class TokenAnalyzerApp(QMainWindow):
         container.setLayout(layout)
         self.setCentralWidget(container)
         
-        # Таймер для обновления данных в реальном времени
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_real_time_data)
-        
         # Таймер для обновления логов
         self.log_timer = QTimer()
         self.log_timer.timeout.connect(self.flush_logs)
         self.log_timer.start(100)
         self.log_signal.connect(self.append_log)
 
+        # Таймер для периодической сводки метрик
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.log_metrics_summary)
+        self.metrics_timer.start(60000)  # Сводка раз в минуту
+
     @pyqtSlot(str)
     def append_log(self, message):
         self.log_buffer.append(message)
@@ -83,9 +90,16 @@ class TokenAnalyzerApp(QMainWindow):
     def log(self, message):
         self.log_signal.emit(message)
 
+    def log_metrics_summary(self):
+        if self.is_scanning:
+            self.log(metrics.summary())
+
     def toggle_analysis(self):
         if not self.is_scanning:
             # Запускаем анализ
+            if self.controller.busy:
+                self.log("Предыдущий анализ ещё завершает текущий запрос. Попробуйте через несколько секунд.")
+                return
             mint_address = self.inputField.text()
             if not mint_address:
                 self.log("Пожалуйста, введите адрес токена.")
@@ -101,63 +115,60 @@ class TokenAnalyzerApp(QMainWindow):
             self.log(f"Запуск анализа для токена {mint_address}...")
             
             # Запускаем анализ в отдельном потоке
-            analysis_thread = threading.Thread(target=self.analyze_token, args=(mint_address, 1))
-            analysis_thread.daemon = True
-            analysis_thread.start()
-            
-            # Запускаем таймер для обновления данных в реальном времени
-            self.timer.start(10000)  # Обновление каждые 10 секунд
+            self.controller.start()
+            self.controller.spawn(self.analyze_token, mint_address, 1, name="analysis")
         else:
-            # Останавливаем анализ
+            # Останавливаем анализ: потоки завершатся после текущего запроса, сохранив загруженное
             self.is_scanning = False
-            self.paused = False
-            self.pause_event.set()  # Снимаем паузу, если она была
-            self.timer.stop()  # Останавливаем таймер обновления данных
+            self.controller.stop()
+            self.pauseButton.setText("Пауза")
             self.startStopButton.setText("Начать анализ")
             self.log("Анализ остановлен.")
 
     def analyze_token(self, mint_address, token_id):
         self.log(f"Начало анализа токена {mint_address} в потоке...")
-        total_supply, decimals, symbol = fetch_token_metadata(mint_address, self)
-        if decimals is None:
-            self.log(f"Токен {mint_address} не поддерживается или не имеет метаданных. Пропускаем анализ.")
-            self.is_scanning = False
-            self.startStopButton.setText("Начать анализ")
-            self.timer.stop()
-            return
-        self.log(f"Метаданные получены: total_supply={total_supply}, decimals={decimals}, symbol={symbol}")
-        
-        # Загружаем исторические транзакции
-        self.current_url_index = fetch_historical_transactions(mint_address, token_id, self, self.current_url_index)
-        self.log(f"Анализ исторических данных для токена {mint_address} завершён.")
-        
-        # Если сканирование не остановлено, продолжаем в режиме реального времени
-        if self.is_scanning:
+        try:
+            total_supply, decimals, symbol = fetch_token_metadata(mint_address, self)
+            if decimals is None:
+                self.log(f"Токен {mint_address} не поддерживается или не имеет метаданных. Пропускаем анализ.")
+                self.is_scanning = False
+                self.startStopButton.setText("Начать анализ")
+                return
+            self.log(f"Метаданные получены: total_supply={total_supply}, decimals={decimals}, symbol={symbol}")
+
+            # Загружаем исторические транзакции
+            with metrics.profile_run(self):
+                self.current_url_index = fetch_historical_transactions(mint_address, token_id, self, self.current_url_index)
+            self.log(f"Анализ исторических данных для токена {mint_address} завершён.")
+
+            # Продолжаем в режиме реального времени до остановки; задержка между опросами внутри функции
             self.log("Переход к сбору данных в реальном времени...")
+            while not self.controller.stopped:
+                self.log(f"Обновление данных в реальном времени для {mint_address}...")
+                self.current_url_index = fetch_real_time_transactions(mint_address, token_id, self, self.current_url_index)
+        except IngestionCancelled:
+            self.log(f"Анализ токена {mint_address} остановлен, загруженные данные сохранены.")
 
     def toggle_pause(self):
-        if self.paused:
-            self.paused = False
-            self.pause_event.set()
+        if self.controller.paused:
+            self.controller.resume()
+            self.pauseButton.setText("Пауза")
             self.log("Анализ возобновлен.")
         else:
-            self.paused = True
-            self.pause_event.clear()
+            self.controller.pause()
+            self.pauseButton.setText("Продолжить")
             self.log("Анализ приостановлен.")
 
-    def update_real_time_data(self):
-        if not self.is_scanning:
-            return
-        if not self.paused and self.current_mint_address and self.last_signature:
-            self.log(f"Обновление данных в реальном времени для {self.current_mint_address}...")
-            self.current_url_index = fetch_real_time_transactions(self.current_mint_address, 1, self, self.current_url_index)
-        elif not self.current_mint_address:
-            self.log("Нет активного токена для обновления в реальном времени.")
-        elif not self.last_signature:
-            self.log("Ожидание завершения загрузки исторических данных...")
-
     def closeEvent(self, event):
-        close_db()
+        # Сначала останавливаем воркеры, и только потом закрываем соединения, которыми они пользуются
+        self.controller.stop()
+        self.metrics_timer.stop()
+        if self.controller.join(timeout=REQUEST_TIMEOUT + 5):
+            close_client()
+            close_db()
+        else:
+            print("Потоки загрузки не завершились вовремя; соединение с базой данных оставлено открытым")
+        metrics.stop_metrics_server()
         event.accept()
 
 if __name__ == '__main__':
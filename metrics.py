@@ -0,0 +1,259 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Границы корзин гистограмм задержек, в секундах
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS_HOST = "127.0.0.1"  # Эндпоинт доступен только локально
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # METRICS_PORT=0 отключает эндпоинт
+PROFILE_PATH = os.getenv("PROFILE_BACKFILL")  # Путь для .prof файла; если не задан, профилирование выключено
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}
+_server = None
+_profile_session = None  # Профили рабочих потоков активного profile_run
+
+
+class Histogram:
+    """Накопительная гистограмма задержек в формате Prometheus."""
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценивает квантиль по верхней границе корзины."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def inc(name, value=1, **labels):
+    """Увеличивает счётчик name с заданными метками."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Добавляет наблюдение в гистограмму name с заданными метками."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def gauge(name, value, **labels):
+    """Устанавливает текущее значение показателя name (например, глубину очереди)."""
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+@contextmanager
+def timed(stage, **labels):
+    """Замеряет длительность блока как стадию stage (можно использовать и как декоратор)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("ingest_stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+
+def reset():
+    """Сбрасывает все накопленные метрики."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _gauges.clear()
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = []
+    for k, v in items:
+        v = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus():
+    """Возвращает все метрики в текстовом формате Prometheus."""
+    with _lock:
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+        histograms = sorted((key, (list(h.counts), h.count, h.sum)) for key, h in _histograms.items())
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), value in gauges:
+        if name not in typed:
+            lines.append(f"# TYPE {name} gauge")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), (counts, count, total) in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """Короткая сводка по стадиям для лога GUI/CLI."""
+    with _lock:
+        rows = []
+        for (name, labels), h in sorted(_histograms.items()):
+            fields = dict(labels)
+            label = fields.pop("stage", name)
+            if fields:
+                label += " [" + ", ".join(fields.values()) + "]"
+            rows.append(
+                f"{label}: n={h.count}, всего={h.sum:.2f} с, сред={h.sum / h.count * 1000:.1f} мс, "
+                f"p50={h.quantile(0.5) * 1000:.0f} мс, p99={h.quantile(0.99) * 1000:.0f} мс, max={h.max * 1000:.0f} мс"
+            )
+        for (name, labels), value in sorted(_counters.items()):
+            label = ", ".join(v for _, v in labels)
+            rows.append(f"{name}[{label}] = {value:g}")
+        for (name, labels), value in sorted(_gauges.items()):
+            label = ", ".join(v for _, v in labels)
+            rows.append(f"{name}[{label}] = {value:g}")
+    if not rows:
+        return "Метрики: данных пока нет"
+    return "Метрики:\n" + "\n".join(rows)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Не засоряем stdout запросами скрейпера
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Запускает HTTP-эндпоинт /metrics в фоновом потоке. Возвращает сервер или None."""
+    global _server
+    if not port or _server is not None:
+        return _server
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return _server
+
+
+def stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+@contextmanager
+def profile_run(app=None, path=PROFILE_PATH, top=25):
+    """Профилирует блок через cProfile, если задан path (переменная PROFILE_BACKFILL).
+
+    cProfile видит только свой поток, поэтому рабочие потоки, запущенные внутри блока
+    через profile_thread(), профилируются отдельно, и их статистика объединяется в один .prof.
+    """
+    global _profile_session
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    session = []
+    _profile_session = session
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile_session = None
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        with _lock:
+            thread_profilers = list(session)
+        if thread_profilers:
+            stats.add(*thread_profilers)
+        stats.dump_stats(path)
+        if app is not None:
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats("cumulative").print_stats(top)
+            app.log(f"Профиль сохранён в {path} (потоков: {len(thread_profilers) + 1})\n{stream.getvalue()}")
+
+
+@contextmanager
+def profile_thread():
+    """Профилирует текущий рабочий поток, если активен profile_run."""
+    session = _profile_session
+    if session is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # С Python 3.12 cProfile построен на sys.monitoring: второй профилировщик не включается,
+        # а профилировщик profile_run и так видит все потоки. Поток работает без своего профиля
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _lock:
+            session.append(profiler)
@@ -0,0 +1,232 @@
+import os
+import queue
+import threading
+from contextlib import ExitStack
+import metrics
+from lifecycle import IngestionCancelled
+
+# Параллелизм стадий и high-water marks очередей (переопределяются переменными окружения)
+FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", "4"))
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "2"))
+SIGNATURE_QUEUE_SIZE = int(os.getenv("INGEST_SIGNATURE_QUEUE", "100"))
+TRANSACTION_QUEUE_SIZE = int(os.getenv("INGEST_TRANSACTION_QUEUE", "20"))  # Полные jsonParsed ответы — самые тяжёлые
+ROW_QUEUE_SIZE = int(os.getenv("INGEST_ROW_QUEUE", "1000"))
+WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH", "100"))
+
+_DONE = object()  # Маркер конца потока данных для воркера стадии
+_POLL_INTERVAL = 0.5
+
+
+class IngestionPipeline:
+    """Конвейер ингестии: пейджер подписей -> загрузчики транзакций -> парсеры -> запись в БД.
+
+    Стадии связаны ограниченными очередями, поэтому сеть, разбор и диск работают параллельно,
+    а объём данных в памяти не зависит от размера загрузки.
+
+    pager() — генератор страниц подписей (списков), fetch(signature, url_index) -> (tx, url_index),
+    parse(tx) -> список строк для database.save_transactions, write(rows) сохраняет пачку строк
+    и возвращает число реально вставленных.
+    on_progress(signature) вызывается после записи с самой старой подписью, до которой
+    включительно все подписи этого запуска сохранены, — это безопасная точка возобновления.
+
+    При остановке (controller.stop() или ошибка стадии) новые запросы не отправляются,
+    а уже загруженные транзакции дописываются в БД.
+    """
+
+    def __init__(self, pager, fetch, parse, write, app, url_index=0, on_progress=None, controller=None,
+                 fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS,
+                 signature_queue_size=SIGNATURE_QUEUE_SIZE, transaction_queue_size=TRANSACTION_QUEUE_SIZE,
+                 row_queue_size=ROW_QUEUE_SIZE, batch_size=WRITE_BATCH_SIZE):
+        self.pager = pager
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.app = app
+        self.url_index = url_index
+        self.on_progress = on_progress
+        self.controller = controller
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        self.signatures = queue.Queue(maxsize=signature_queue_size)
+        self.transactions = queue.Queue(maxsize=transaction_queue_size)
+        self.rows = queue.Queue(maxsize=row_queue_size)
+        self.stop_event = threading.Event()
+        self.error = None
+        self.saved = 0
+        self._lock = threading.Lock()
+        self._running = {}
+        self._issued = {}  # seq -> подпись, ещё не вошедшая в сохранённый префикс
+        self._completed = set()
+        self._watermark = -1
+
+    def run(self):
+        """Запускает все стадии и ждёт их завершения. Возвращает число вставленных строк.
+
+        Бросает IngestionCancelled, если загрузка была остановлена до конца.
+        """
+        stages = [("pager", self._pager, 1), ("fetcher", self._fetcher, self.fetch_workers),
+                  ("parser", self._parser, self.parse_workers), ("writer", self._writer, 1)]
+        threads = []
+        for name, target, count in stages:
+            self._running[name] = count
+            for i in range(count):
+                thread = threading.Thread(target=self._run_stage, args=(target,), name=f"ingest-{name}-{i}", daemon=True)
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+        # Остановка без исключения (пейджер или загрузчики вышли по stopping) — тоже отмена:
+        # часть подписей могла остаться несохранённой, и вызывающий не должен сдвигать курсоры
+        if self.stopping:
+            raise IngestionCancelled("Загрузка остановлена")
+        return self.saved
+
+    def _run_stage(self, target):
+        # cProfile видит только свой поток: при включённом профилировании каждый воркер профилируется сам
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(metrics.profile_thread())
+            except Exception:
+                pass  # Без профиля стадия всё равно должна отработать и вызвать _finish, иначе соседи не дождутся маркера
+            target()
+
+    def stop(self, error=None):
+        """Останавливает загрузку; транзакции, уже прошедшие fetch, будут сохранены."""
+        with self._lock:
+            if error is not None and self.error is None:
+                self.error = error
+        self.stop_event.set()
+
+    @property
+    def stopping(self):
+        return self.stop_event.is_set() or (self.controller is not None and self.controller.stopped)
+
+    def _put_signature(self, item):
+        """Кладёт подпись в очередь, ожидая места; возвращает False, если загрузка остановлена."""
+        while not self.stopping:
+            try:
+                self.signatures.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get_signature(self):
+        """Берёт подпись из очереди; возвращает _DONE, если загрузка остановлена."""
+        while not self.stopping:
+            try:
+                return self.signatures.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _finish(self, stage, next_queue, next_workers):
+        """Когда завершается последний воркер стадии, сообщает об этом следующей стадии."""
+        with self._lock:
+            self._running[stage] -= 1
+            last = self._running[stage] == 0
+        if not last:
+            return
+        for _ in range(next_workers):
+            if next_queue is not self.signatures:
+                next_queue.put(_DONE)  # Парсеры и писатель всегда дочитывают свои очереди
+            elif not self._put_signature(_DONE):
+                break
+
+    def _pager(self):
+        seq = 0
+        try:
+            for page in self.pager():
+                for sig in page:
+                    with self._lock:
+                        self._issued[seq] = sig["signature"]
+                    if not self._put_signature((seq, sig)):
+                        return
+                    seq += 1
+                if self.stopping:
+                    return
+        except Exception as e:
+            self.stop(e)
+        finally:
+            self._finish("pager", self.signatures, self.fetch_workers)
+
+    def _fetcher(self):
+        url_index = self.url_index
+        try:
+            while True:
+                item = self._get_signature()
+                if item is _DONE:
+                    return
+                seq, sig = item
+                tx, url_index = self.fetch(sig, url_index)
+                self.transactions.put((seq, tx))
+        except Exception as e:
+            self.stop(e)
+        finally:
+            self._finish("fetcher", self.transactions, self.parse_workers)
+
+    def _parser(self):
+        # Парсер дочитывает очередь до маркера и после остановки, чтобы не заблокировать загрузчики на put
+        try:
+            while True:
+                item = self.transactions.get()
+                if item is _DONE:
+                    return
+                seq, tx = item
+                try:
+                    rows = self.parse(tx) if tx else []
+                except Exception as e:
+                    self.stop(e)
+                    continue
+                self.rows.put((seq, rows))
+        finally:
+            self._finish("parser", self.rows, 1)
+
+    def _writer(self):
+        # Писатель не реагирует на остановку: он дочитывает очередь до маркера, чтобы не терять строки
+        batch, seqs = [], []
+        while True:
+            try:
+                item = self.rows.get(timeout=_POLL_INTERVAL) if not seqs else self.rows.get_nowait()
+            except queue.Empty:
+                self._flush(batch, seqs)
+                batch, seqs = [], []
+                continue
+            if item is _DONE:
+                break
+            seq, rows = item
+            seqs.append(seq)
+            batch.extend(rows)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, seqs)
+                batch, seqs = [], []
+        self._flush(batch, seqs)
+
+    def _flush(self, batch, seqs):
+        if not seqs:
+            return
+        metrics.gauge("ingest_queue_depth", self.signatures.qsize(), queue="signatures")
+        metrics.gauge("ingest_queue_depth", self.transactions.qsize(), queue="transactions")
+        metrics.gauge("ingest_queue_depth", self.rows.qsize(), queue="rows")
+        try:
+            if batch:
+                self.saved += self.write(batch)
+            self._advance(seqs)
+        except Exception as e:
+            # Подписи несохранённой пачки не войдут в префикс, поэтому точка возобновления останется до них
+            self.stop(e)
+
+    def _advance(self, seqs):
+        """Сдвигает сохранённый префикс подписей и сообщает новую точку возобновления."""
+        self._completed.update(seqs)
+        signature = None
+        with self._lock:
+            while self._watermark + 1 in self._completed:
+                self._watermark += 1
+                self._completed.discard(self._watermark)
+                signature = self._issued.pop(self._watermark)
+        if signature is not None and self.on_progress is not None:
+            self.on_progress(signature)
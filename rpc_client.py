@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import asyncio
+import weakref
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+# orjson заметно быстрее стандартного json на больших jsonParsed ответах
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# httpx нужен только для HTTP/2 и нативного asyncio; без него работаем через requests
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = httpx is not None
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "application/json",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Content-Type": "application/json",
+}
+
+REQUEST_TIMEOUT = 10  # Таймаут 10 секунд
+POOL_MAXSIZE = 10  # Максимум keep-alive соединений на один RPC
+HTTP2_ENABLED = os.getenv("RPC_HTTP2", "0") == "1"  # Включается переменной окружения RPC_HTTP2=1
+
+
+def loads(data):
+    """Декодирует JSON, используя orjson, если он установлен."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """Кодирует объект в JSON (bytes), используя orjson, если он установлен."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def endpoint_of(url):
+    """Возвращает scheme://host RPC без пути и api-key (ключ пула и безопасная метка для логов)."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class RPCResponse:
+    """Ответ RPC с интерфейсом, совместимым с requests.Response."""
+    __slots__ = ("url", "status_code", "reason", "content")
+
+    def __init__(self, url, status_code, reason, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} {self.reason} for url: {endpoint_of(self.url)}"
+            )
+
+    def json(self):
+        # Ошибку разбора (HTML-страница прокси с кодом 200 и т.п.) приводим к исключению requests,
+        # чтобы try_request переключился на резервный RPC, как при ошибке HTTP
+        with metrics.timed("json_decode"):
+            try:
+                return loads(self.content)
+            except ValueError as e:
+                raise requests.exceptions.InvalidJSONError(
+                    f"Некорректный JSON в ответе {endpoint_of(self.url)}: {e}"
+                ) from e
+
+
+class RPCClient:
+    """Клиент JSON-RPC с отдельным пулом keep-alive соединений для каждого RPC."""
+
+    def __init__(self, headers=None, timeout=REQUEST_TIMEOUT, pool_maxsize=POOL_MAXSIZE, http2=HTTP2_ENABLED):
+        self.headers = dict(headers or HEADERS)
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._sessions = {}
+        self._async_clients = weakref.WeakKeyDictionary()  # цикл событий -> {RPC: AsyncClient}
+        self._lock = threading.Lock()
+
+    def _session(self, url):
+        """Возвращает (создаёт при первом обращении) сессию для RPC по url."""
+        endpoint = endpoint_of(url)
+        session = self._sessions.get(endpoint)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(endpoint)
+            if session is None:
+                if self.http2:
+                    session = httpx.Client(
+                        http2=True,
+                        headers=self.headers,
+                        timeout=self.timeout,
+                        limits=httpx.Limits(max_keepalive_connections=self.pool_maxsize),
+                    )
+                else:
+                    session = requests.Session()
+                    session.headers.update(self.headers)
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                self._sessions[endpoint] = session
+        return session
+
+    def request(self, method, url, body=None, params=None, rpc_method=None):
+        """Выполняет HTTP-запрос через пул соединений RPC."""
+        session = self._session(url)
+        labels = {"method": rpc_method or method, "endpoint": endpoint_of(url)}
+        start = time.perf_counter()
+        try:
+            if not self.http2:
+                response = session.request(method, url, data=body, params=params, timeout=self.timeout)
+                status, reason = response.status_code, response.reason
+            else:
+                # Приводим ошибки httpx к исключениям requests, которые ожидают вызывающие функции
+                try:
+                    response = session.request(method, url, content=body, params=params)
+                except httpx.TimeoutException as e:
+                    raise requests.exceptions.Timeout(str(e)) from e
+                except httpx.HTTPError as e:
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+                status, reason = response.status_code, response.reason_phrase
+        except requests.exceptions.RequestException as e:
+            metrics.inc("rpc_errors_total", error=type(e).__name__, **labels)
+            raise
+        finally:
+            metrics.observe("ingest_stage_seconds", time.perf_counter() - start, stage="rpc", **labels)
+        metrics.inc("rpc_requests_total", status=status, **labels)
+        return RPCResponse(url, status, reason, response.content)
+
+    def post(self, url, payload):
+        """Отправляет JSON-RPC запрос."""
+        return self.request("POST", url, body=dumps(payload), rpc_method=payload.get("method"))
+
+    def get(self, url, params=None):
+        return self.request("GET", url, params=params)
+
+    async def apost(self, url, payload):
+        """Асинхронный вариант post: через httpx.AsyncClient или в пуле потоков."""
+        if httpx is None:
+            return await asyncio.to_thread(self.post, url, payload)
+        # AsyncClient привязан к циклу событий, поэтому пулы ведутся отдельно для каждого цикла
+        loop = asyncio.get_running_loop()
+        endpoint = endpoint_of(url)
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(endpoint)
+            if client is None:
+                client = httpx.AsyncClient(
+                    http2=self.http2,
+                    headers=self.headers,
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_keepalive_connections=self.pool_maxsize),
+                )
+                clients[endpoint] = client
+        labels = {"method": payload.get("method"), "endpoint": endpoint_of(url)}
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, content=dumps(payload))
+        except httpx.TimeoutException as e:
+            metrics.inc("rpc_errors_total", error="Timeout", **labels)
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            metrics.inc("rpc_errors_total", error="ConnectionError", **labels)
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        finally:
+            metrics.observe("ingest_stage_seconds", time.perf_counter() - start, stage="rpc", **labels)
+        metrics.inc("rpc_requests_total", status=response.status_code, **labels)
+        return RPCResponse(url, response.status_code, response.reason_phrase, response.content)
+
+    def close(self):
+        """Закрывает все пулы соединений, в том числе асинхронные клиенты всех циклов событий."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            pools = list(self._async_clients.items())
+            self._async_clients.clear()
+        for loop, clients in pools:
+            if loop.is_closed():
+                continue  # Транспорты закрытого цикла уже закрыты вместе с ним
+            for client in clients.values():
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+                else:
+                    loop.run_until_complete(client.aclose())
+
+    async def aclose(self):
+        """Закрывает асинхронные клиенты текущего цикла событий."""
+        with self._lock:
+            clients = self._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Возвращает общий для приложения RPCClient."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RPCClient()
+    return _client
+
+
+def close_client():
+    """Закрывает общий RPCClient при завершении работы."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,24 @@
+from benchmarks import run as bench
+
+
+def _result(name, tx_per_s, failed=None):
+    return {"scenario": name, "failed": failed, "tx_per_s": tx_per_s, "p50_ms": 1.0, "p99_ms": 2.0,
+            "peak_rss_mb": 40.0, "elapsed": 1.0, "summary": ""}
+
+
+def test_incomplete_scenario_fails_run(monkeypatch):
+    monkeypatch.setattr(bench, "run", lambda name, options: _result(
+        name, None, "загрузка не завершена: 15 из 500 транзакций"))
+    assert bench.main(["backfill"]) == 1
+
+
+def test_complete_scenario_passes(monkeypatch):
+    monkeypatch.setattr(bench, "run", lambda name, options: _result(name, 100.0))
+    assert bench.main(["backfill"]) == 0
+
+
+def test_compare_skips_failed_results():
+    baseline = [_result("backfill", 100.0)]
+    failed = _result("backfill", None, "загрузка не завершена")
+    failed["p99_ms"] = 500.0
+    assert bench.compare([failed], baseline, 0.1) == []
@@ -0,0 +1,49 @@
+import pytest
+import database
+import metrics
+
+
+@pytest.fixture
+def db(tmp_path):
+    database.init_db(str(tmp_path / "test.db"))
+    metrics.reset()
+    yield
+    database.close_db()
+
+
+def _row(signature, type_):
+    return (1, signature, 100, "2025-01-01 00:00:00", type_, "owner", "unknown", 1.0, "TST", None, 0)
+
+
+def test_save_transactions_counts_only_inserted_rows(db):
+    rows = [_row("sig1", "SWAP"), _row("sig1", "TRANSFER"), _row("sig1", "TRANSFER"), _row("sig2", "TRANSFER")]
+    assert database.save_transactions(rows) == 2
+    # Повторная запись тех же подписей ничего не вставляет
+    assert database.save_transactions(rows) == 0
+    text = metrics.render_prometheus()
+    assert 'transactions_saved_total{type="SWAP"} 1' in text
+    assert 'transactions_saved_total{type="TRANSFER"} 1' in text
+
+
+def test_save_transactions_keeps_first_row_per_signature(db):
+    database.save_transactions([_row("sig1", "SWAP"), _row("sig1", "TRANSFER")])
+    _, cursor = database.get_db_connection()
+    cursor.execute("SELECT type FROM transactions WHERE signature = 'sig1'")
+    assert cursor.fetchall() == [("SWAP",)]
+    cursor.close()
+
+
+def test_failed_batch_is_rolled_back(db):
+    conn, cursor = database.get_db_connection()
+    cursor.execute('''
+        CREATE TRIGGER fail_on_bad BEFORE INSERT ON transactions WHEN NEW.signature = 'bad'
+        BEGIN SELECT RAISE(ABORT, 'bad row'); END
+    ''')
+    conn.commit()
+    with pytest.raises(database.sqlite3.Error):
+        database.save_transactions([_row("sig1", "SWAP"), _row("bad", "TRANSFER")])
+    # Следующий коммит не должен сохранить строки упавшей пачки
+    database.save_cursor("mint", last_signature="sig0")
+    cursor.execute("SELECT COUNT(*) FROM transactions")
+    assert cursor.fetchone() == (0,)
+    cursor.close()
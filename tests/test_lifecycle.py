@@ -0,0 +1,168 @@
+import time
+import threading
+import pytest
+import database
+from lifecycle import IngestionController, IngestionCancelled
+
+
+def test_checkpoint_raises_after_stop():
+    controller = IngestionController()
+    controller.checkpoint()
+    controller.stop()
+    with pytest.raises(IngestionCancelled):
+        controller.checkpoint()
+    controller.start()
+    controller.checkpoint()
+
+
+def test_checkpoint_waits_while_paused():
+    controller = IngestionController()
+    controller.pause()
+    passed = threading.Event()
+    worker = threading.Thread(target=lambda: (controller.checkpoint(), passed.set()))
+    worker.start()
+    assert not passed.wait(0.3)
+    controller.resume()
+    assert passed.wait(2)
+    worker.join()
+
+
+def test_sleep_is_interrupted_by_stop():
+    controller = IngestionController()
+    threading.Timer(0.2, controller.stop).start()
+    start = time.monotonic()
+    with pytest.raises(IngestionCancelled):
+        controller.sleep(30)
+    assert time.monotonic() - start < 2
+
+
+def test_join_waits_for_spawned_workers():
+    controller = IngestionController()
+    controller.spawn(controller.sleep, 30)
+    assert controller.busy
+    controller.stop()
+    assert controller.join(timeout=2)
+    assert not controller.busy
+
+
+def test_stop_during_real_time_poll_keeps_cursor(tmp_path):
+    import api
+    from benchmarks.mock_rpc import MockRPCServer
+    from benchmarks.synthetic import make_fixtures
+    from benchmarks.run import HeadlessApp
+
+    app = HeadlessApp()
+
+    class StopOnSignatures(MockRPCServer):
+        # Остановка приходит, пока getSignaturesForAddress ещё в полёте
+        def handle(self, method, params):
+            if method == "getSignaturesForAddress":
+                app.controller.stop()
+            return super().handle(method, params)
+
+    fixtures = make_fixtures(20)
+    database.init_db(str(tmp_path / "test.db"))
+    server = StopOnSignatures(fixtures, visible=10).start()
+    original = list(api.RPC_URLS)
+    api.RPC_URLS[:] = [server.url]
+    last_signature = fixtures["signatures"][server.head]["signature"]
+    app.last_signature = last_signature
+    database.save_cursor(fixtures["mint"], last_signature=last_signature)
+    server.advance(10)
+    try:
+        with pytest.raises(IngestionCancelled):
+            api.fetch_real_time_transactions(fixtures["mint"], 1, app)
+        assert app.last_signature == last_signature
+        assert database.load_cursor(fixtures["mint"])["last_signature"] == last_signature
+    finally:
+        api.RPC_URLS[:] = original
+        server.stop()
+        database.close_db()
+
+
+def test_retry_backoff_is_interrupted_by_stop():
+    from tenacity import retry, stop_after_attempt, retry_if_exception_type
+    from api import RPCUnreachableException, wait_rpc_backoff
+    from benchmarks.run import HeadlessApp
+
+    app = HeadlessApp()
+    attempts = []
+
+    @retry(stop=stop_after_attempt(5), wait=wait_rpc_backoff, retry=retry_if_exception_type(RPCUnreachableException))
+    def unreachable():
+        attempts.append(time.monotonic())
+        raise RPCUnreachableException("RPC не отвечает", app)
+
+    threading.Timer(0.2, app.controller.stop).start()
+    start = time.monotonic()
+    # Без прерываемой паузы воркер провёл бы в бэкоффе 4–20 секунд после stop()
+    with pytest.raises(IngestionCancelled):
+        unreachable()
+    assert time.monotonic() - start < 2
+    assert len(attempts) == 1
+
+
+@pytest.mark.parametrize("last_signature", [None, "known"])
+def test_real_time_poll_waits_before_next_attempt(tmp_path, monkeypatch, last_signature):
+    import api
+    from benchmarks.mock_rpc import MockRPCServer
+    from benchmarks.synthetic import make_fixtures
+    from benchmarks.run import HeadlessApp
+
+    app = HeadlessApp()
+    app.last_signature = last_signature
+    monkeypatch.setattr(api, "REQUEST_DELAY", 0.2)
+    # Без подписей (None) или без decimals (неизвестный токен) функция раньше возвращалась без задержки,
+    # и цикл реального времени в main.py крутился вхолостую
+    fixtures = make_fixtures(0)
+    fixtures["token_supply"] = {}
+    database.init_db(str(tmp_path / "test.db"))
+    server = MockRPCServer(fixtures).start()
+    original = list(api.RPC_URLS)
+    api.RPC_URLS[:] = [server.url]
+    try:
+        start = time.monotonic()
+        polls = 0
+        while time.monotonic() - start < 1:
+            api.fetch_real_time_transactions(fixtures["mint"], 1, app)
+            polls += 1
+        assert polls <= 5
+        assert server.requests <= 5
+    finally:
+        api.RPC_URLS[:] = original
+        server.stop()
+        database.close_db()
+
+
+def test_real_time_poll_stops_on_short_page(tmp_path, monkeypatch):
+    import api
+    from benchmarks.mock_rpc import MockRPCServer
+    from benchmarks.synthetic import make_fixtures
+    from benchmarks.run import HeadlessApp
+
+    class CountingServer(MockRPCServer):
+        signature_calls = 0
+
+        def handle(self, method, params):
+            if method == "getSignaturesForAddress":
+                CountingServer.signature_calls += 1
+            return super().handle(method, params)
+
+    monkeypatch.setattr(api, "REQUEST_DELAY", 0)
+    fixtures = make_fixtures(20)
+    database.init_db(str(tmp_path / "test.db"))
+    server = CountingServer(fixtures, visible=17).start()
+    original = list(api.RPC_URLS)
+    api.RPC_URLS[:] = [server.url]
+    app = HeadlessApp()
+    app.last_signature = fixtures["signatures"][server.head]["signature"]
+    server.advance(3)
+    try:
+        api.fetch_real_time_transactions(fixtures["mint"], 1, app)
+        # Три новые подписи укладываются в одну страницу — второй запрос за пустой страницей не нужен
+        assert CountingServer.signature_calls == 1
+        assert app.last_signature == fixtures["signatures"][0]["signature"]
+    finally:
+        api.RPC_URLS[:] = original
+        server.stop()
+        database.close_db()
@@ -0,0 +1,73 @@
+import pytest
+import pstats
+import metrics
+from pipeline import IngestionPipeline
+
+
+class _App:
+    def log(self, message):
+        pass
+
+
+def _make_pipeline(pages, write=None, **kwargs):
+    return IngestionPipeline(
+        pager=lambda: iter(pages),
+        fetch=lambda sig, url_index: ({"signature": sig["signature"]}, url_index),
+        parse=lambda tx: [(1, tx["signature"], 0, "2025-01-01 00:00:00", "TRANSFER", "a", "b", 1.0, "TST", None, 0)],
+        write=write or (lambda rows: len(rows)),
+        app=_App(),
+        **kwargs,
+    )
+
+
+def _page(*names):
+    return [{"signature": name} for name in names]
+
+
+def test_pipeline_writes_every_transaction():
+    written = []
+    pipeline = _make_pipeline([_page("a", "b"), _page("c")], write=lambda rows: written.extend(rows) or len(rows))
+    assert pipeline.run() == 3
+    assert sorted(row[1] for row in written) == ["a", "b", "c"]
+
+
+def test_profile_run_includes_pipeline_workers(tmp_path):
+    path = str(tmp_path / "run.prof")
+
+    def parse_marker(tx):
+        return []
+
+    pipeline = _make_pipeline([_page("a", "b")])
+    pipeline.parse = parse_marker
+    with metrics.profile_run(path=path):
+        pipeline.run()
+    functions = {name for (_, _, name) in pstats.Stats(path).stats}
+    # parse выполняется в потоке ingest-parser, а не в потоке, вызвавшем profile_run
+    assert "parse_marker" in functions
+
+
+def test_pipeline_raises_cancelled_when_stopped():
+    from lifecycle import IngestionController, IngestionCancelled
+    controller = IngestionController()
+
+    def pager():
+        yield _page("a")
+        controller.stop()
+        yield _page("b")
+
+    pipeline = _make_pipeline([], controller=controller)
+    pipeline.pager = pager
+    # Иначе вызывающий принял бы остановку за полный проход и сдвинул курсор за несохранённые подписи
+    with pytest.raises(IngestionCancelled):
+        pipeline.run()
+
+
+def test_pipeline_runs_when_thread_profiler_cannot_start(monkeypatch):
+    class BusyProfile:
+        # Так ведёт себя cProfile на Python 3.12+, когда профилировщик profile_run уже активен
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(metrics.cProfile, "Profile", BusyProfile)
+    monkeypatch.setattr(metrics, "_profile_session", [])
+    assert _make_pipeline([_page("a", "b"), _page("c")]).run() == 3
@@ -0,0 +1,96 @@
+import pytest
+import requests
+from rpc_client import RPCResponse
+
+
+def test_invalid_json_raises_request_exception():
+    # try_request переключается на резервный RPC только по RequestException
+    response = RPCResponse("https://rpc.example/?api-key=secret", 200, "OK", b"<html>Bad gateway</html>")
+    with pytest.raises(requests.exceptions.RequestException) as excinfo:
+        response.json()
+    assert "secret" not in str(excinfo.value)
+
+
+def test_valid_json_is_decoded():
+    response = RPCResponse("https://rpc.example/", 200, "OK", b'{"jsonrpc": "2.0", "result": "ok"}')
+    assert response.json()["result"] == "ok"
+
+
+def test_close_releases_async_clients():
+    import asyncio
+    import rpc_client
+    if rpc_client.httpx is None:
+        pytest.skip("httpx не установлен")
+    client = rpc_client.RPCClient()
+
+    async def post_and_get_pool():
+        with pytest.raises(requests.exceptions.RequestException):
+            await client.apost("http://127.0.0.1:9/", {"method": "getHealth"})
+        return list(client._async_clients[asyncio.get_running_loop()].values())
+
+    loop = asyncio.new_event_loop()
+    try:
+        pool = loop.run_until_complete(post_and_get_pool())
+        client.close()
+        assert len(client._async_clients) == 0
+        assert all(c.is_closed for c in pool)
+    finally:
+        loop.close()
+
+
+def test_async_request_waits_while_paused():
+    import asyncio
+    import time
+    import threading
+    import api
+    from benchmarks.mock_rpc import MockRPCServer
+    from benchmarks.synthetic import make_fixtures
+    from benchmarks.run import HeadlessApp
+
+    app = HeadlessApp()
+    app.controller.pause()
+    with MockRPCServer(make_fixtures(1)) as server:
+        original = list(api.RPC_URLS)
+        api.RPC_URLS[:] = [server.url]
+        results = []
+        worker = threading.Thread(target=lambda: results.append(asyncio.run(
+            api.atry_request({"jsonrpc": "2.0", "id": 1, "method": "getHealth"}, app))))
+        try:
+            worker.start()
+            time.sleep(0.3)
+            assert server.requests == 0  # Запрос не уходит, пока стоит пауза
+            app.controller.resume()
+            worker.join(5)
+        finally:
+            api.RPC_URLS[:] = original
+        assert server.requests == 1
+        assert results[0][0]["result"] == "ok"
+        assert not app.controller.paused
+
+
+def test_afetch_transactions_cancels_remaining_requests(monkeypatch):
+    import asyncio
+    import api
+    from benchmarks.run import HeadlessApp
+
+    app = HeadlessApp()
+    sent = []
+
+    async def fake_atry_request(payload, app, url_index=0):
+        signature = payload["params"][0]
+        if signature == "sig0":
+            raise api.RPCUnreachableException("Все RPC недоступны", app)
+        await asyncio.sleep(0.1)
+        sent.append(signature)
+        return {"result": {"signature": signature}}, url_index
+
+    monkeypatch.setattr(api, "atry_request", fake_atry_request)
+
+    async def run():
+        with pytest.raises(api.RPCUnreachableException):
+            await api.afetch_transactions([f"sig{i}" for i in range(10)], app, concurrency=3)
+        # Задачи, стоявшие за семафором или уже ждавшие ответа, отменены и больше ничего не отправляют
+        await asyncio.sleep(0.5)
+
+    asyncio.run(run())
+    assert sent == []
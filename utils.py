@@ -3,6 +3,7 @@ from database import get_db_connection
 from tenacity import retry, stop_after_attempt, wait_exponential
 from collections import defaultdict, deque
 import json
+from rpc_client import get_client
 
 def parse_timestamp(timestamp_str):
     try:
@@ -20,7 +21,7 @@ def extract_price_from_swaps(token_id, mint_address, app):
     LIMIT 1
     ''', (token_id,))
     swap = cursor.fetchone()
-    conn.close()
+    cursor.close()  # Соединение общее, закрываем только курсор
 
     if swap:
         amount, timestamp = swap
@@ -31,12 +32,11 @@ def extract_price_from_swaps(token_id, mint_address, app):
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def fetch_wallet_balance(wallet_address, app):
-    from api import requests
     helius_api_key = app.helius_api_key
     url = f"https://api.helius.xyz/v0/addresses/{wallet_address}/balances?api-key={helius_api_key}"
     try:
         app.log(f"Запрос баланса для кошелька {wallet_address}")
-        response = requests.get(url)
+        response = get_client().get(url)
         response.raise_for_status()
         data = response.json()
         app.log(f"Ответ API для {wallet_address}: {json.dumps(data, indent=2)}")
@@ -54,7 +54,6 @@ def fetch_wallet_balance(wallet_address, app):
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def fetch_wallet_balances(wallet_addresses, mint_address, app):
-    from api import requests
     helius_api_key = app.helius_api_key
     url = "https://api.helius.xyz/v0/addresses/balances"
     params = {
@@ -64,7 +63,7 @@ def fetch_wallet_balances(wallet_addresses, mint_address, app):
     }
     try:
         app.log(f"Запрос балансов для {len(wallet_addresses)} кошельков")
-        response = requests.get(url, params=params)
+        response = get_client().get(url, params=params)
         response.raise_for_status()
         balances = {}
         for wallet_data in response.json():
@@ -85,7 +84,7 @@ def find_connected_wallets(token_id, max_depth=5):
     WHERE token_id = ?
     ''', (token_id,))
     relations = cursor.fetchall()
-    conn.close()
+    cursor.close()  # Соединение общее, закрываем только курсор
 
     graph = defaultdict(list)
     for from_addr, to_addr in relations: